@@ -4,11 +4,58 @@ Fetches data from Wikipedia and outputs a formatted medal count table.
 Appends daily snapshots to a historical CSV for time series analysis.
 """
 
-import requests
-from bs4 import BeautifulSoup
+import requests_cache
+from requests.adapters import HTTPAdapter
+from selectolax.lexbor import LexborHTMLParser
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
 from datetime import datetime
+import csv
+import hashlib
+import json
 import os
+import re
+import sys
+
+
+# Shared session so repeated scrapes reuse pooled keep-alive connections. Responses are
+# cached on disk for an hour, after which requests_cache revalidates them with
+# If-None-Match/If-Modified-Since and keeps serving the stored body on a 304
+_SESSION = requests_cache.CachedSession(
+    ".medal_http_cache.sqlite",
+    expire_after=3600,
+    allowable_methods=("GET",),
+)
+_SESSION.headers.update({
+    "User-Agent":      "Mozilla/5.0 (compatible; OlympicsMedalScraper/1.0)",
+    # urllib3 decodes these transparently (br via the brotli package)
+    "Accept-Encoding": "gzip, deflate, br",
+})
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# Footnote markers such as "[a]" (and anything after them) trailing a cell's text
+_FOOTNOTE_RE = re.compile(r"\[.*", re.DOTALL)
+
+# Header row of the medal table: gold, silver and bronze columns in that order
+_MEDAL_HEADER_RE = re.compile(r"gold.*silver.*bronze", re.IGNORECASE | re.DOTALL)
+
+# Compact dtypes for the medal table: counts fit in int16 and the string columns repeat
+# heavily across days of history
+_DTYPES = {
+    "Scrape_Date": "category",
+    "Rank":        "category",
+    "Country":     "category",
+    "Gold":        "int16",
+    "Silver":      "int16",
+    "Bronze":      "int16",
+    "Total":       "int16",
+}
+
+# Body hash and parsed table from the last fetch, so unchanged pages skip re-parsing
+CACHE_META_FILE = ".medal_cache.json"
+CACHE_TABLE_FILE = ".medal_cache.pkl"
 
 
 def scrape_medal_table(url: str = "https://en.wikipedia.org/wiki/2026_Winter_Olympics_medal_table") -> pd.DataFrame:
@@ -16,122 +63,199 @@ def scrape_medal_table(url: str = "https://en.wikipedia.org/wiki/2026_Winter_Oly
     Scrapes the 2026 Winter Olympics medal table from Wikipedia.
     Returns a pandas DataFrame with columns: Rank, Country, Gold, Silver, Bronze, Total
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; OlympicsMedalScraper/1.0)"
-    }
-
     print(f"Fetching data from: {url}")
-    response = requests.get(url, headers=headers, timeout=10)
+    response = _SESSION.get(url, timeout=10)
     response.raise_for_status()
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    meta = _load_cache_meta()
+    digest = hashlib.sha256(response.content).hexdigest()
+    if meta.get("url") == url and meta.get("sha256") == digest and os.path.exists(CACHE_TABLE_FILE):
+        print("Page content unchanged since last fetch, reusing cached table")
+        df = pd.read_pickle(CACHE_TABLE_FILE)
+    else:
+        df = _parse_medal_table(response.content)
+        df.to_pickle(CACHE_TABLE_FILE)
+        with open(CACHE_META_FILE, "w") as f:
+            json.dump({"url": url, "sha256": digest}, f)
+
+    df.insert(0, "Scrape_Date", datetime.now().strftime("%Y-%m-%d"))
+    return df.astype(_DTYPES)
+
+
+def _load_cache_meta() -> dict:
+    """Returns the cached page metadata, or an empty dict if there is none."""
+    try:
+        with open(CACHE_META_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _parse_medal_table(html: bytes) -> pd.DataFrame:
+    """Extracts the medal table (without Scrape_Date) from the raw page bytes."""
+    tree = LexborHTMLParser(html)
 
-    # Wikipedia medal tables have a wikitable class, often with 'sortable'
+    # Wikipedia medal tables have a wikitable class, often with 'sortable'; a single selector
+    # query yields each wikitable's first row instead of one lookup per table
     medal_table = None
-    for table in soup.find_all("table", class_="wikitable"):
-        headers_row = table.find("tr")
-        if headers_row:
-            header_text = headers_row.get_text().lower()
-            # Look for a table that has gold/silver/bronze columns
-            if "gold" in header_text and "silver" in header_text and "bronze" in header_text:
-                medal_table = table
-                break
+    for headers_row in tree.css(
+        "table.wikitable > thead > tr:first-child, table.wikitable > tbody > tr:first-child"
+    ):
+        # Look for a table that has gold/silver/bronze columns
+        if _MEDAL_HEADER_RE.search(headers_row.text()):
+            medal_table = headers_row.parent.parent
+            break
 
     if medal_table is None:
         raise ValueError("Could not find a medal table on the page. The page structure may have changed.")
 
-    rows = []
-    for tr in medal_table.find_all("tr")[1:]:  # Skip header row
-        cols = tr.find_all(["td", "th"])
+    ranks, countries, golds, silvers, bronzes, totals = [], [], [], [], [], []
+    for tr in medal_table.css("tr")[1:]:  # Skip header row
+        cols = tr.css("td, th")
         if len(cols) < 5:
             continue
 
-        # Extract text, stripping footnotes and whitespace
-        def clean(cell):
-            return cell.get_text(strip=True).replace("\xa0", " ").split("[")[0].strip()
+        ranks.append(cols[0].text(strip=True))
+        countries.append(cols[1].text(strip=True))
+        golds.append(cols[2].text(strip=True))
+        silvers.append(cols[3].text(strip=True))
+        bronzes.append(cols[4].text(strip=True))
+        totals.append(cols[5].text(strip=True) if len(cols) > 5 else "")
 
-        rank    = clean(cols[0])
-        country = clean(cols[1])
-        gold    = clean(cols[2])
-        silver  = clean(cols[3])
-        bronze  = clean(cols[4])
-        total   = clean(cols[5]) if len(cols) > 5 else ""
+    # Build the frame column-wise in one go rather than from per-row dicts
+    df = pd.DataFrame({
+        "Rank":    ranks,
+        "Country": countries,
+        "Gold":    golds,
+        "Silver":  silvers,
+        "Bronze":  bronzes,
+        "Total":   totals,
+    }, dtype=object)
 
-        # Skip rows that are totals/summary rows (often marked with * or "Total")
-        if "total" in country.lower() or "total" in rank.lower():
-            continue
+    # Strip footnotes and non-breaking spaces column-wise instead of per cell
+    for col in df.columns:
+        df[col] = (
+            df[col].str.replace("\xa0", " ", regex=False)
+                   .str.replace(_FOOTNOTE_RE, "", regex=True)
+                   .str.strip()
+        )
 
-        # Skip empty rows
-        if not country:
-            continue
+    # Skip rows that are totals/summary rows (often marked with * or "Total") and empty rows
+    is_total = (
+        df["Country"].str.lower().str.contains("total", regex=False)
+        | df["Rank"].str.lower().str.contains("total", regex=False)
+    )
+    df = df[~is_total & (df["Country"] != "")].reset_index(drop=True)
+
+    # Non-numeric medal cells (blank, dashes) count as zero
+    for col in ["Gold", "Silver", "Bronze", "Total"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int16")
 
-        rows.append({
-            "Scrape_Date": datetime.now().strftime("%Y-%m-%d"),
-            "Rank":        rank,
-            "Country":     country,
-            "Gold":        int(gold)   if gold.isdigit()   else 0,
-            "Silver":      int(silver) if silver.isdigit() else 0,
-            "Bronze":      int(bronze) if bronze.isdigit() else 0,
-            "Total":       int(total)  if total.isdigit()  else 0,
-        })
-
-    df = pd.DataFrame(rows)
     return df
 
 
 def display_table(df: pd.DataFrame) -> None:
     """Prints a nicely formatted medal table to the console."""
     scrape_date = df["Scrape_Date"].iloc[0] if not df.empty else "N/A"
-    print("\n" + "=" * 60)
-    print(f"  2026 WINTER OLYMPICS MEDAL TABLE")
-    print(f"  Scraped: {scrape_date}")
-    print("=" * 60)
-    print(f"{'Rank':<6} {'Country':<30} {'🥇 Gold':<10} {'🥈 Silver':<10} {'🥉 Bronze':<10} {'Total':<6}")
-    print("-" * 60)
-
-    for _, row in df.iterrows():
-        print(
-            f"{str(row['Rank']):<6} "
-            f"{row['Country']:<30} "
-            f"{str(row['Gold']):<10} "
-            f"{str(row['Silver']):<10} "
-            f"{str(row['Bronze']):<10} "
-            f"{str(row['Total']):<6}"
+    lines = [
+        "\n" + "=" * 60,
+        f"  2026 WINTER OLYMPICS MEDAL TABLE",
+        f"  Scraped: {scrape_date}",
+        "=" * 60,
+        f"{'Rank':<6} {'Country':<30} {'🥇 Gold':<10} {'🥈 Silver':<10} {'🥉 Bronze':<10} {'Total':<6}",
+        "-" * 60,
+    ]
+
+    columns = ["Rank", "Country", "Gold", "Silver", "Bronze", "Total"]
+    for rank, country, gold, silver, bronze, total in df[columns].itertuples(index=False, name=None):
+        lines.append(
+            f"{str(rank):<6} "
+            f"{country:<30} "
+            f"{str(gold):<10} "
+            f"{str(silver):<10} "
+            f"{str(bronze):<10} "
+            f"{str(total):<6}"
         )
 
-    print("=" * 60)
-    print(f"  Total countries: {len(df)}")
-    print(f"  Total medals:    {df['Total'].sum()}")
-    print("=" * 60)
+    lines += [
+        "=" * 60,
+        f"  Total countries: {len(df)}",
+        f"  Total medals:    {df['Total'].sum()}",
+        "=" * 60,
+    ]
+
+    # One write for the whole table rather than a print per row
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def save_snapshot(df: pd.DataFrame, filename: str = "medal_table_latest.csv") -> None:
     """Saves today's snapshot as a standalone CSV (always overwritten)."""
-    df.to_csv(filename, index=False)
+    # The stdlib writer skips pandas' CSV formatter, which is overkill for this small fixed schema
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(df.columns)
+        writer.writerows(df.itertuples(index=False, name=None))
     print(f"Latest snapshot saved to: {filename}")
 
 
 def append_to_history(df: pd.DataFrame, history_file: str = "medal_table_history.csv") -> None:
     """
-    Appends today's snapshot to the historical CSV for time series analysis.
+    Appends today's snapshot to the history file for time series analysis.
+    A history_file ending in .parquet is stored as Parquet, anything else as CSV
+    (the dashboard reads the CSV, so that stays the default).
     If the file already contains today's date, it replaces that date's rows
     so re-running the scraper on the same day stays idempotent.
     """
     today = df["Scrape_Date"].iloc[0]
+    is_parquet = history_file.endswith(".parquet")
 
-    if os.path.exists(history_file):
-        existing = pd.read_csv(history_file)
-        # Drop any rows already recorded for today (idempotent re-runs)
-        existing = existing[existing["Scrape_Date"] != today]
-        combined = pd.concat([existing, df], ignore_index=True)
+    if not os.path.exists(history_file):
+        _write_history(df, history_file)
+        total_dates = 1
     else:
-        combined = df
+        # Only the date column is needed to tell whether today is already recorded
+        recorded_dates = _read_history(history_file, columns=["Scrape_Date"])["Scrape_Date"].unique()
+
+        if today not in recorded_dates and not is_parquet:
+            # Common case: a new day, so just append its rows to the end of the CSV
+            df.to_csv(history_file, mode="a", header=False, index=False)
+            total_dates = len(recorded_dates) + 1
+        else:
+            existing = _read_history(history_file)
+            # Drop any rows already recorded for today (idempotent re-runs)
+            existing = existing[existing["Scrape_Date"] != today]
+            # The schema is fixed, so join column arrays directly instead of via pd.concat,
+            # then restore the compact dtypes the plain numpy arrays lose
+            combined = pd.DataFrame(
+                {col: np.concatenate([existing[col].to_numpy(), df[col].to_numpy()]) for col in df.columns},
+                copy=False,
+            ).astype(_DTYPES)
+            _write_history(combined, history_file)
+            total_dates = combined["Scrape_Date"].nunique()
 
-    combined.to_csv(history_file, index=False)
-    total_dates = combined["Scrape_Date"].nunique()
     print(f"History file updated: {history_file} ({total_dates} day(s) of data)")
 
 
+def _read_history(history_file: str, columns: list = None) -> pd.DataFrame:
+    """Reads the history file (or just the given columns) as CSV or Parquet."""
+    if history_file.endswith(".parquet"):
+        return pd.read_parquet(history_file, columns=columns)
+    # pyarrow's multi-threaded CSV reader; keep dates and ranks as strings rather than inferred types
+    convert_options = pacsv.ConvertOptions(
+        include_columns=columns or [],
+        column_types={"Scrape_Date": pa.string(), "Rank": pa.string()},
+    )
+    return pacsv.read_csv(history_file, convert_options=convert_options).to_pandas()
+
+
+def _write_history(df: pd.DataFrame, history_file: str) -> None:
+    """Overwrites the history file as CSV or Parquet."""
+    if history_file.endswith(".parquet"):
+        df.to_parquet(history_file, compression="zstd", index=False)
+    else:
+        df.to_csv(history_file, index=False)
+
+
 if __name__ == "__main__":
     # Scrape the medal table
     df = scrape_medal_table()